@@ -1,11 +1,11 @@
-import os
 import pathlib
 import re
+import shutil
 import subprocess
 
 from .msvc import EnvironmentDumpError
 from .msvc import ProgramNotFoundError
-from .msvc import VisualStudioError
+from .msvc import DevEnvError
 from .msvc import find_visual_studio_by_path
 from .msvc import find_visual_studios
 from .msvc import find_visual_studio_by_uid
@@ -17,9 +17,12 @@ def dump(
     vstudio_args: None | list[str] = None,
     use_cache: bool = True,
 ) -> dict[str, str]:
+    # use_cache=True both reads and writes the cache, and the cache stores
+    # every environment variable in plaintext (see README)
     vstudio_instance = None
-    if isinstance(vstudio, str) and re.match(r"[a-zA-Z0-9]{8}", vstudio):
-        vstudio_instance = find_visual_studio_by_uid(vstudio)
+    if isinstance(vstudio, str) and re.fullmatch(r"[a-zA-Z0-9]{8}", vstudio):
+        vstudio_instance = find_visual_studio_by_uid(
+            vstudio, read_cache=use_cache, write_cache=use_cache)
     else:
         vstudio_instance = find_visual_studio_by_path(vstudio)
 
@@ -29,7 +32,8 @@ def dump(
     return get_visual_studio_env_vars(
         vstudio_instance,
         vstudio_args,
-        use_cache,
+        read_cache=use_cache,
+        write_cache=use_cache,
     )
 
 
@@ -46,16 +50,16 @@ def run(
 
     env = dump(vstudio)
 
-    # have to update os.environ b/c passing the "env" param to subprocess.run()
-    # doesn't include the new $PATH when looking for the command executable
-    apply_env = set(env.items()) - set(os.environ.items())
-    unapply_env = set(os.environ.items()) - set(env.items())
+    # passing env= to subprocess.run() doesn't use the new $PATH when looking
+    # for the command executable, so resolve it against the dev env ourselves.
+    # The env comes from cmd.exe's "set" (usually "Path=") and is a plain,
+    # case-sensitive dict, so the key has to be looked up case-insensitively
+    if not shell:
+        path = next((v for k, v in env.items() if k.upper() == "PATH"), None)
+        exe = shutil.which(cmd[0], path=path) or cmd[0]
+        cmd = [exe, *cmd[1:]]
 
-    os.environ.update(apply_env)
-    exit_code = subprocess.run(cmd, shell=shell, cwd=cwd).returncode
-    os.environ.update(unapply_env)
-
-    return exit_code
+    return subprocess.run(cmd, shell=shell, cwd=cwd, env=env).returncode
 
 
 def list() -> list[tuple[str, str]]:
@@ -65,7 +69,7 @@ def list() -> list[tuple[str, str]]:
 __all__ = [
     "EnvironmentDumpError",
     "ProgramNotFoundError",
-    "VisualStudioError",
+    "DevEnvError",
     "run",
     "dump",
     "list",
@@ -32,10 +32,11 @@ __license__: str = 'MIT'
 __version__: str = '0.1.1'
 
 import argparse
+import concurrent.futures
 import configparser
 import enum
+import functools
 import hashlib
-import itertools
 import json
 import os
 import pathlib
@@ -44,6 +45,9 @@ import re
 import struct
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 import typing
 
 try:
@@ -51,6 +55,11 @@ try:
 except ImportError:
     winreg = None
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 EXITCODE_SUCCESS: int = 0
 EXITCODE_FAILED_TO_ACQUIRE_ENV: int = 254
@@ -60,7 +69,7 @@ REG_UNINSTALL32: str = (
 REG_UNINSTALL64: str = (
     "SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall")
 REG_INSTALL_LOC: str = "InstallLocation"
-IGNORE_VARIABLES: list[str] = [
+IGNORE_VARIABLES: frozenset[str] = frozenset({
     "PWD",
     "CMD_DURATION_MS", # nushell
     "LAST_EXIT_CODE", # nushell
@@ -73,7 +82,18 @@ IGNORE_VARIABLES: list[str] = [
     "PROMPT_MULTILINE_INDICATOR",
     "WT_PROFILE_ID",
     "WT_SESSION",
-]
+})
+
+_SEMVER_RE: re.Pattern = re.compile(
+    r"^([0-9]+)\.([0-9]+)\.([0-9]+)" +
+    r"(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?" +
+    r"(?:\+([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?$")
+_VS_DISPLAYNAME_RE: re.Pattern = re.compile(
+    r"^Visual Studio\s+(?:[a-zA-Z0-9]+\s+)?[0-9]{4}$")
+_ARG_RE: re.Pattern = re.compile(
+    r"^(?:(?:(?P<neg>no|disable)|enable)[_-](?P<flag>[a-zA-Z0-9_-]+)" +
+    r"|(?P<key>[a-zA-Z0-9_-]+)=(?P<val>.+)" +
+    r"|(?P<plain>[a-zA-Z0-9_-]+))$")
 
 
 class VisualStudioAppPlatform(enum.StrEnum):
@@ -114,12 +134,7 @@ class Arch(enum.StrEnum):
 
 class SemanticVersion:
     def __init__(self, version: str) -> None:
-        m = re.match(
-            r"^([0-9]+)\.([0-9]+)\.([0-9]+)" +
-            r"(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?" +
-            r"(?:\+([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?$",
-            version,
-        )
+        m = _SEMVER_RE.match(version)
 
         if not m:
             raise ValueError(
@@ -145,8 +160,8 @@ class SemanticVersion:
             except ValueError:
                 pass
 
-    def _to_tuple(self) -> tuple[int, int, int, float, float]:
-        return (
+        # computed once since instances are compared repeatedly when sorting
+        self._sort_key: tuple[int, int, int, float, float] = (
             self.major,
             self.minor,
             self.patch,
@@ -158,8 +173,8 @@ class SemanticVersion:
         if not isinstance(other, self.__class__):
             return NotImplemented
 
-        self_t = self._to_tuple()
-        other_t = other._to_tuple()
+        self_t = self._sort_key
+        other_t = other._sort_key
 
         if self_t < other_t:
             return -1
@@ -172,38 +187,39 @@ class SemanticVersion:
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return NotImplemented
-        return self._to_tuple() == other._to_tuple()
+        return self._sort_key == other._sort_key
 
     def __ne__(self, other):
         if not isinstance(other, self.__class__):
             return NotImplemented
-        return self._to_tuple() != other._to_tuple()
+        return self._sort_key != other._sort_key
 
     def __lt__(self, other):
         if not isinstance(other, self.__class__):
             return NotImplemented
-        return self._to_tuple() < other._to_tuple()
+        return self._sort_key < other._sort_key
 
     def __le__(self, other):
         if not isinstance(other, self.__class__):
             return NotImplemented
-        return self._to_tuple() <= other._to_tuple()
+        return self._sort_key <= other._sort_key
 
     def __gt__(self, other):
         if not isinstance(other, self.__class__):
             return NotImplemented
-        return self._to_tuple() > other._to_tuple()
+        return self._sort_key > other._sort_key
 
     def __ge__(self, other):
         if not isinstance(other, self.__class__):
             return NotImplemented
-        return self._to_tuple() >= other._to_tuple()
+        return self._sort_key >= other._sort_key
 
 
 class EnvironmentCache:
     def __init__(self, cache_name: str):
         self._cache_dir: str = os.path.join(self._get_cache_dir(), "devenv", cache_name)
         self._envs_dir: str = os.path.join(self._cache_dir, "env")
+        self._outputs_dir: str = os.path.join(self._cache_dir, "output")
 
     @classmethod
     def _get_cache_dir(cls) -> str:
@@ -215,16 +231,47 @@ class EnvironmentCache:
             return os.getenv("XDG_CACHE_HOME") or \
                 os.path.expanduser("~/.cache")
 
+    @classmethod
+    def _loads(cls, data: bytes) -> typing.Any:
+        if orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    @classmethod
+    def _dumps(cls, o: typing.Any) -> bytes:
+        if orjson:
+            return orjson.dumps(o, option=orjson.OPT_INDENT_2)
+        return json.dumps(o, indent=2).encode("utf-8")
+
     @classmethod
     def _read_json(cls, path: str) -> None | list | dict:
         try:
-            with open(path, "r") as f:
-                return json.load(f)
-        except (FileNotFoundError, OSError, json.JSONDecodeError):
+            with open(path, "rb") as f:
+                return cls._loads(f.read())
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError):
             pass
 
         return None
 
+    @classmethod
+    def _write_json(cls, path: str, o: typing.Any):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # write then rename so a crash mid-write can't leave a corrupt cache.
+        # The temp file is unique so parallel writers don't clobber each other
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(cls._dumps(o))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
     def _to_cached_env_path(
         self,
         toolchain: str,
@@ -249,13 +296,31 @@ class EnvironmentCache:
         return cached_env
 
     def write_env(self, toolchain: str, config: str, env: dict[str, str]):
-        cached_env_path = self._to_cached_env_path(toolchain, config)
-        cached_env_dir = os.path.dirname(cached_env_path)
+        self._write_json(self._to_cached_env_path(toolchain, config), env)
 
-        os.makedirs(cached_env_dir, exist_ok=True)
+    def _to_cached_output_path(self, program: str, config: str) -> str:
+        return os.path.join(self._outputs_dir, program, f"{config}.json")
 
-        with open(cached_env_path, "w") as f:
-            json.dump(env, f, indent=2)
+    def read_output(
+        self,
+        program: str,
+        config: str,
+        max_age_secs: None | float = None,
+    ) -> None | list | dict:
+        cached_output_path = self._to_cached_output_path(program, config)
+
+        if max_age_secs is not None:
+            try:
+                mtime = os.path.getmtime(cached_output_path)
+            except OSError:
+                return None
+            if time.time() - mtime > max_age_secs:
+                return None
+
+        return self._read_json(cached_output_path)
+
+    def write_output(self, program: str, config: str, output: list | dict):
+        self._write_json(self._to_cached_output_path(program, config), output)
 
 
 def get_host_arch() -> Arch:
@@ -282,47 +347,70 @@ def get_host_arch() -> Arch:
 
 
 
+def _read_reg_last_modified(root: int, key_path: str) -> int:
+    if not winreg:
+        return 0
+
+    try:
+        with winreg.OpenKey(root, key_path) as h_key:
+            _, _, last_modified = winreg.QueryInfoKey(h_key)
+            return last_modified
+    except OSError:
+        return 0
+
+
+def _is_reg_value_match(
+    val: typing.Any,
+    crit_val: bool | int | str | re.Pattern,
+    regex: bool = False,
+) -> bool:
+    if isinstance(val, str):
+        val = val.strip(" \v\t'\"")
+
+    if isinstance(crit_val, re.Pattern):
+        try:
+            return bool(crit_val.match(val))
+        except TypeError:
+            return False
+
+    if not regex:
+        if isinstance(crit_val, bool) or isinstance(crit_val, int):
+            try:
+                return int(val) == int(crit_val)
+            except (TypeError, ValueError):
+                return False
+        return val == crit_val
+
+    try:
+        return bool(re.match(crit_val, val))  # type: ignore
+    except TypeError:
+        return False
+
+
 def _is_reg_key_match(
     prog_key: int,
-    prog: dict[str, bool | int | str],
+    prog: dict[str, bool | int | str | re.Pattern],
     regex: bool = False,
 ) -> bool:
     if not winreg:
         return False
 
-    is_match = True
     for crit_key, crit_val in prog.items():
         try:
             val, _ = winreg.QueryValueEx(prog_key, crit_key)
-            val = val.strip(" \v\t'\"")
         except FileNotFoundError:
-            is_match = False
-            break
-
-        if not regex:
-            if isinstance(crit_val, bool) or isinstance(crit_val, int):
-                try:
-                    is_match = int(val) == int(crit_val)
-                except ValueError:
-                    is_match = False
-            else:
-                is_match = val == crit_val
-        else:
-            try:
-                is_match = bool(re.match(crit_val, val))  # type: ignore
-            except TypeError:
-                pass
+            return False
 
-        if not is_match:
-            break
+        if not _is_reg_value_match(val, crit_val, regex):
+            return False
 
-    return is_match
+    return True
 
 
 def _read_reg_uninst_paths(
     root: int,
     uninst_path: str,
-    prog: dict[str, bool | int | str],
+    prog: dict[str, bool | int | str | re.Pattern],
     regex: bool = False,
 ) -> list[str]:
     if not winreg:
@@ -331,12 +419,13 @@ def _read_reg_uninst_paths(
     install_locs = []
     try:
         with winreg.OpenKey(root, uninst_path) as h_uninst:
-            for i in itertools.count():
+            subkey_count, _, _ = winreg.QueryInfoKey(h_uninst)
+            for i in range(subkey_count):
                 try:
                     prog_uid = winreg.EnumKey(h_uninst, i)
                 except OSError:
-                    # no more keys
-                    break
+                    # key was removed while we were enumerating
+                    continue
 
                 try:
                     with winreg.OpenKey(h_uninst, prog_uid) as h_prog:
@@ -359,37 +448,51 @@ def _read_reg_uninst_paths(
     return install_locs
 
 
-def read_winreg_uninstall_paths(prog: dict[str, bool | int | str],
-                                regex: bool = False) -> list[str]:
+def read_winreg_uninstall_paths(
+    prog: dict[str, bool | int | str | re.Pattern],
+    regex: bool = False,
+    include_user_hive: bool = True,
+) -> list[str]:
     if not winreg:
         return []
-    return (_read_reg_uninst_paths(winreg.HKEY_CURRENT_USER, REG_UNINSTALL32,
-                                   prog, regex) +
-            _read_reg_uninst_paths(winreg.HKEY_CURRENT_USER, REG_UNINSTALL64,
-                                   prog, regex) +
-            _read_reg_uninst_paths(winreg.HKEY_LOCAL_MACHINE, REG_UNINSTALL32,
-                                   prog, regex) +
-            _read_reg_uninst_paths(winreg.HKEY_LOCAL_MACHINE, REG_UNINSTALL64,
-                                   prog, regex))
-
-
-def read_winreg_uninstall_path(prog: dict[str, bool | int | str],
-                               regex: bool = False) -> None | str:
+
+    hives = []
+    if include_user_hive:
+        hives.append((winreg.HKEY_CURRENT_USER, REG_UNINSTALL32))
+        hives.append((winreg.HKEY_CURRENT_USER, REG_UNINSTALL64))
+    hives.append((winreg.HKEY_LOCAL_MACHINE, REG_UNINSTALL32))
+    hives.append((winreg.HKEY_LOCAL_MACHINE, REG_UNINSTALL64))
+
+    # registry reads are I/O bound, so scanning the hives concurrently
+    # overlaps the waits. Results are collected in hive order
+    with concurrent.futures.ThreadPoolExecutor(len(hives)) as executor:
+        futures = [
+            executor.submit(_read_reg_uninst_paths, root, path, prog, regex)
+            for root, path in hives
+        ]
+        return [loc for f in futures for loc in f.result()]
+
+
+def read_winreg_uninstall_path(
+    prog: dict[str, bool | int | str | re.Pattern],
+    regex: bool = False,
+) -> None | str:
     locs = read_winreg_uninstall_paths(prog, regex)
     return locs[0] if locs else None
 
 
-def _argparse_caseins_choice_type(
-        choices: list[str]) -> typing.Callable[[str], str]:
-    lowercase_to_normalcase = {s.lower(): s for s in choices}
+class _ArgparseCaseInsChoiceType:
+    __slots__ = ("_lowercase_to_normalcase",)
 
-    def check(arg: str) -> str:
-        arg_lower = arg.lower()
-        if arg_lower in lowercase_to_normalcase:
-            return lowercase_to_normalcase[arg_lower]
-        raise argparse.ArgumentTypeError(f'Unrecognized choice "{arg}".')
+    def __init__(self, choices: list[str]):
+        self._lowercase_to_normalcase: dict[str, str] = {
+            s.lower(): s for s in choices}
 
-    return check
+    def __call__(self, arg: str) -> str:
+        try:
+            return self._lowercase_to_normalcase[arg.lower()]
+        except KeyError:
+            raise argparse.ArgumentTypeError(f'Unrecognized choice "{arg}".')
 
 
 def _argparse_path_type(
@@ -433,24 +536,52 @@ def _argparse_path_type(
 
 class VisualStudio:
     TIMEOUT_SECS: int = 30
+    INI_ENCODING: str = "utf-8-sig"
 
     def __init__(self, root: str | pathlib.Path):
         if isinstance(root, str):
             root = pathlib.Path(root)
 
         self._root: pathlib.Path = root
+        ini_path = self._find_vsdev_ini()
+        if not ini_path:
+            raise ProgramNotFoundError(
+                f'"{root}" is not a Visual Studio program directory.')
+
+        # the ini is only parsed once a field other than uid is needed
+        self._ini_path: pathlib.Path = ini_path
+        self._uid: None | str = None
+
+    @functools.cached_property
+    def _info(self) -> dict[str, str]:
         try:
-            ini_path = self._find_vsdev_ini()
             cfg = configparser.ConfigParser()
-            cfg.read(str(ini_path))
-        except (FileNotFoundError, KeyError, ValueError):
+            cfg.read(str(self._ini_path), encoding=self.INI_ENCODING)
+            return dict(cfg["Info"])
+        except (configparser.Error, KeyError, OSError, UnicodeDecodeError):
             raise ProgramNotFoundError(
-                '"{root}" is not a Visual Studio program directory.')
+                f'"{self._root}" is not a Visual Studio program directory.')
 
-        self._uid: str = cfg["Info"]["InstallationID"]
-        self._name: str = cfg["Info"]["InstallationName"]
-        self._version: str = cfg["Info"]["SemanticVersion"]
-        self._arch: str = cfg["Info"]["ProductArch"]
+    def _read_uid(self) -> str:
+        # listing installations only needs the uid, so scan for it directly
+        # instead of parsing the whole ini
+        try:
+            with open(self._ini_path, "r", encoding=self.INI_ENCODING) as f:
+                in_info = False
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("["):
+                        # only accept the key from [Info], like _info does
+                        if in_info:
+                            break
+                        in_info = line == "[Info]"
+                    elif in_info:
+                        key, sep, value = line.partition("=")
+                        if sep and key.strip().lower() == "installationid":
+                            return value.strip()
+        except (OSError, UnicodeDecodeError):
+            pass
+        return self._info["installationid"]
 
     @property
     def root(self) -> str:
@@ -458,27 +589,46 @@ class VisualStudio:
 
     @property
     def uid(self) -> str:
+        if self._uid is None:
+            self._uid = self._read_uid()
         return self._uid
 
     @property
     def name(self) -> str:
-        return self._name
+        return self._info["installationname"]
 
     @property
     def version(self) -> str:
-        return self._version
+        return self._info["semanticversion"]
 
     @property
     def arch(self) -> str:
-        return self._arch
+        return self._info["productarch"]
+
+    @functools.cached_property
+    def vsdevcmd_path(self) -> None | str:
+        bat = self._find_vsdev_cmd()
+        return str(bat) if bat else None
+
+    def _find_in_common_dir(self, *rel: str) -> None | pathlib.Path:
+        # equivalent to self._root.glob("Common*/...") but without the
+        # overhead of the generic glob machinery for a one-level match
+        try:
+            with os.scandir(self._root) as it:
+                for e in it:
+                    if e.name.startswith("Common") and e.is_dir():
+                        p = os.path.join(e.path, *rel)
+                        if os.path.isfile(p):
+                            return pathlib.Path(p)
+        except OSError:
+            pass
+        return None
 
     def _find_vsdev_cmd(self) -> None | pathlib.Path:
-        rel = next(self._root.glob("Common*/Tools/VsDevCmd.bat"), None)
-        return self._root.joinpath(rel) if rel else None
+        return self._find_in_common_dir("Tools", "VsDevCmd.bat")
 
     def _find_vsdev_ini(self) -> None | pathlib.Path:
-        rel = next(self._root.glob("Common*/IDE/devenv.isolation.ini"), None)
-        return self._root.joinpath(rel) if rel else None
+        return self._find_in_common_dir("IDE", "devenv.isolation.ini")
 
     def dump_environment_vars(
         self,
@@ -486,41 +636,67 @@ class VisualStudio:
     ) -> dict[str, str]:
         env = {}
 
-        bat = self._find_vsdev_cmd()
+        bat = self.vsdevcmd_path
         if not bat:
             raise EnvironmentDumpError("Failed to find env startup script.")
 
         # see $VISUALSTUDIO/Common7/Tools/vsdevcmd/core/parse_cmd.bat for
         # valid command-line arguments
+        # same command line that shell=True would build, plus /d so cmd.exe
+        # skips the AutoRun commands from the registry
+        # shell=True's %ComSpec% fallback (gh-101283): never hand a bare
+        # "cmd.exe" to CreateProcess, which would search the cwd first
+        comspec = os.environ.get("ComSpec")
+        if not comspec:
+            system_root = os.environ.get("SystemRoot", "")
+            comspec = os.path.join(system_root, "System32", "cmd.exe")
+            if not os.path.isabs(comspec):
+                raise EnvironmentDumpError(
+                    "Shell not found: neither %ComSpec% nor %SystemRoot% "
+                    "is set.")
+        cmdline = subprocess.list2cmdline(
+            [bat, "-no_logo"] + args + ["&", "set"])
+        proc = subprocess.Popen(
+            f'"{comspec}" /d /c "{cmdline}"',
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+
+        # the output is parsed as it streams in, so enforce the timeout by
+        # killing the process rather than by waiting on it
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(self.TIMEOUT_SECS, kill)
+        timer.start()
         try:
-            output = subprocess.run(
-                [bat, "-no_logo"] + args + ["&", "set"],
-                capture_output=True,
-                text=True,
-                shell=True,
-                timeout=self.TIMEOUT_SECS,
-            ).stdout
-        except subprocess.TimeoutExpired:
+            with proc:
+                for line in proc.stdout:  # type: ignore
+                    name, sep, value = line.rstrip("\r\n").partition("=")
+                    # errors come in form of "[ERR]: msg"
+                    if (sep and name and name[0] != "[" and
+                            name not in IGNORE_VARIABLES):
+                        env[name] = value
+        finally:
+            timer.cancel()
+
+        if timed_out.is_set():
             raise EnvironmentDumpError("Environment dump timed out.")
 
-        for line in output.splitlines():
-            if not line.startswith("["):  # errors come in form of "[ERR]: msg"
-                t = line.split("=", maxsplit=1)
-                if t and len(t) >= 2:
-                    env[t[0]] = t[1]
-
         if not env.get("VSCMD_VER"):
             raise EnvironmentDumpError(
                 "Environment dump failed to capture Visual Studio variables.")
 
-        for name in IGNORE_VARIABLES:
-            env.pop(name, None)
-
         return env
 
 
 class VisualStudioInstaller:
     TIMEOUT_SECS: int = 30
+    CACHE_MAX_AGE_SECS: int = 24 * 60 * 60
 
     def __init__(self, root: str | pathlib.Path):
         if isinstance(root, str):
@@ -539,33 +715,96 @@ class VisualStudioInstaller:
             vswhere = None
         return vswhere
 
-    def _run_vswhere(self, vswhere: pathlib.Path) -> list[dict]:
+    @classmethod
+    def _calc_vswhere_config(cls, vswhere: pathlib.Path) -> str:
+        # installing/removing a VS instance touches the Uninstall keys, and
+        # updating the installer replaces vswhere itself
+        st = vswhere.stat()
+        uninst_mtimes = []
+        if winreg:
+            uninst_mtimes = [
+                _read_reg_last_modified(winreg.HKEY_LOCAL_MACHINE, path)
+                for path in (REG_UNINSTALL32, REG_UNINSTALL64)
+            ]
+        return _calc_checksum([
+            f"mtime={st.st_mtime_ns}",
+            f"size={st.st_size}",
+            f"uninst={uninst_mtimes}",
+        ])
+
+    def _read_vswhere_cache(self, config: str) -> None | list[dict]:
+        cache = EnvironmentCache("visualstudio")
+        vsdevs = cache.read_output(
+            "vswhere",
+            config,
+            max_age_secs=self.CACHE_MAX_AGE_SECS,
+        )
+
+        if not isinstance(vsdevs, list):
+            return None
+
+        # an instance was removed without us noticing, rescan
+        for vsdev in vsdevs:
+            if not isinstance(vsdev, dict) or not os.path.isfile(
+                    vsdev.get("productPath") or ""):
+                return None
+
+        return vsdevs
+
+    def _write_vswhere_cache(self, config: str, vsdevs: list[dict]):
+        cache = EnvironmentCache("visualstudio")
+        try:
+            cache.write_output("vswhere", config, vsdevs)
+        except OSError:
+            pass
+
+    def _run_vswhere(
+        self,
+        vswhere: pathlib.Path,
+        read_cache: bool = True,
+        write_cache: bool = False,
+    ) -> list[dict]:
         if not vswhere.is_file():
-            raise FileNotFoundError('"{vswhere}" is not a file.')
+            raise FileNotFoundError(f'"{vswhere}" is not a file.')
+
+        config = None
+        if read_cache or write_cache:
+            config = self._calc_vswhere_config(vswhere)
+
+        if read_cache and config:
+            if (vsdevs := self._read_vswhere_cache(config)) is not None:
+                return vsdevs
 
         vsdevs = []
         output = ""
 
         try:
+            # vswhere is a plain executable, no need to go through cmd.exe
             output = subprocess.run(
                 [vswhere, "-utf8", "-format", "json"],
-                capture_output=True,
-                text=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                encoding="utf-8",
                 timeout=self.TIMEOUT_SECS,
-                shell=True,
             ).stdout
         except subprocess.TimeoutExpired:
             pass
 
         vsdevs.extend(json.loads(output))
+        if write_cache and config:
+            self._write_vswhere_cache(config, vsdevs)
 
         return vsdevs
 
-    def get_visual_studio_roots(self) -> list[str]:
+    def get_visual_studio_roots(
+        self,
+        read_cache: bool = True,
+        write_cache: bool = False,
+    ) -> list[str]:
         vsdevs = []
 
         if vswhere := self._find_vswhere():
-            vsdevs.extend(self._run_vswhere(vswhere))
+            vsdevs.extend(self._run_vswhere(vswhere, read_cache, write_cache))
 
         # ...\Microsoft Visual Studio\2022\Professional\Common7\IDE\devenv.exe
         paths = []
@@ -580,44 +819,88 @@ class VisualStudioInstaller:
         return paths
 
 
-def read_visual_studios_from_winreg() -> list[VisualStudio]:
+def read_visual_studios_from_winreg(
+    include_user_hive: bool = False,
+) -> list[VisualStudio]:
+    # Visual Studio is installed machine-wide, so HKCU is skipped by default
     locs = read_winreg_uninstall_paths(
-        {"DisplayName": r"^Visual Studio\s+(?:[a-zA-Z0-9]+\s+)?[0-9]{4}$"},
-        regex=True,
+        {"DisplayName": _VS_DISPLAYNAME_RE},
+        include_user_hive=include_user_hive,
     )
     return [VisualStudio(p) for p in locs]
 
 
-def read_visual_studios_from_installer() -> list[VisualStudio]:
+def read_visual_studios_from_installer(
+    read_cache: bool = True,
+    write_cache: bool = False,
+) -> list[VisualStudio]:
     vstudios = []
     if loc := read_winreg_uninstall_path(
             {"DisplayName": "Microsoft Visual Studio Installer"}):
         vsi = VisualStudioInstaller(loc)
-        vstudios.extend(VisualStudio(p) for p in vsi.get_visual_studio_roots())
+        vstudios.extend(VisualStudio(p) for p in vsi.get_visual_studio_roots(
+            read_cache, write_cache))
     return vstudios
 
 
-def find_visual_studios() -> list[VisualStudio]:
-    from_vsinstaller = read_visual_studios_from_installer()
-    from_winreg = read_visual_studios_from_winreg()
+_VSTUDIOS_BY_UID: None | dict[str, VisualStudio] = None
+_VSTUDIOS_LOCK: threading.Lock = threading.Lock()
+
+
+def _get_visual_studios_by_uid(
+    read_cache: bool = True,
+    write_cache: bool = False,
+) -> dict[str, VisualStudio]:
+    global _VSTUDIOS_BY_UID
+
+    # vswhere and the registry scan are slow, so only do them once per process
+    # unless the caller asked for fresh results
+    with _VSTUDIOS_LOCK:
+        if _VSTUDIOS_BY_UID is None or not read_cache:
+            # vswhere is authoritative, the registry scan is only a fallback
+            # for when the installer is missing or didn't report anything
+            vstudios = read_visual_studios_from_installer(
+                read_cache, write_cache)
+            if not vstudios:
+                vstudios = read_visual_studios_from_winreg()
+
+            _VSTUDIOS_BY_UID = {vs.uid: vs for vs in vstudios}
+
+        return _VSTUDIOS_BY_UID
+
+
+def find_visual_studios(
+    read_cache: bool = True,
+    write_cache: bool = False,
+) -> list[VisualStudio]:
+    # callers are free to sort/modify the returned list
+    return list(_get_visual_studios_by_uid(read_cache, write_cache).values())
+
 
-    d = {vs.uid: vs for vs in from_winreg}
-    d.update({vs.uid: vs for vs in from_vsinstaller})
+def _clear_visual_studios_cache():
+    global _VSTUDIOS_BY_UID
+    with _VSTUDIOS_LOCK:
+        _VSTUDIOS_BY_UID = None
 
-    return list(d.values())
 
+find_visual_studios.cache_clear = _clear_visual_studios_cache  # pyright: ignore
 
-def find_visual_studio() -> None | VisualStudio:
-    vstudios = find_visual_studios()
+
+def find_visual_studio(
+    read_cache: bool = True,
+    write_cache: bool = False,
+) -> None | VisualStudio:
+    vstudios = find_visual_studios(read_cache, write_cache)
     vstudios.sort(key=lambda o: SemanticVersion(o.version), reverse=True)
     return vstudios[0] if vstudios else None
 
 
-def find_visual_studio_by_uid(uid: str) -> None | VisualStudio:
-    for candidate in find_visual_studios():
-        if candidate.uid == uid:
-            return candidate
-    return None
+def find_visual_studio_by_uid(
+    uid: str,
+    read_cache: bool = True,
+    write_cache: bool = False,
+) -> None | VisualStudio:
+    return _get_visual_studios_by_uid(read_cache, write_cache).get(uid)
 
 
 def find_visual_studio_by_path(path: str | pathlib.Path) -> None | VisualStudio:
@@ -633,55 +916,87 @@ def _clean_arg(name: str,
                ) -> tuple[str, None | bool | int | float | str]:
     name = name.lstrip(" \v\t/-").strip()
 
-    if m := re.match(r"^(?:no|disable)[_-]([a-zA-Z0-9_-]+)$", name):
-        name = m.group(1).replace("-", "_")
-        if value is None:
-            value = False
-        else:
-            value = not value
-    if m := re.match(r"^(?:enable[_-])?([a-zA-Z0-9_-]+)$", name):
-        name = m.group(1).replace("-", "_")
+    m = _ARG_RE.match(name)
+    if not m:
+        return name, value
+
+    if flag := m.group("flag"):
+        name = flag.replace("-", "_")
+        if m.group("neg"):
+            value = False if value is None else not value
+        elif value is None:
+            value = True
+    elif plain := m.group("plain"):
+        name = plain.replace("-", "_")
         if value is None:
             value = True
-        else:
-            value = not value
-    elif m := re.match(r"^([a-zA-Z0-9_-]+)=(.+)$", name):
-        name = m.group(1).replace("-", "_")
-        value = m.group(2)
+    else:
+        name = m.group("key").replace("-", "_")
+        value = m.group("val")
 
-        if m := re.match(r'"(.+)"', value):
-            value = m.group(1)
-        elif m := re.match(r"\'(.+)\'", value):
-            value = m.group(1)
+        if (len(value) >= 2 and value[0] == value[-1] and
+                value[0] in "\"'"):
+            value = value[1:-1]
 
         if value.lower() in ["true", "false"]:
-            value = bool(value)
+            value = value.lower() == "true"
         else:
             try:
-                value = float(value)
+                value = int(value)
             except ValueError:
                 try:
-                    value = int(value)
+                    value = float(value)
                 except ValueError:
                     pass
 
     return name, value
 
 
+def _encode_checksum_field(o: typing.Any) -> bytes:
+    return str(o).encode("utf-8", errors="surrogatepass")
+
+
+def _update_checksum_items(
+    checksum: typing.Any,
+    items: typing.Iterable[tuple[typing.Any, typing.Any]],
+    ignore: typing.Container = (),
+):
+    # the one place that defines how key/value pairs are hashed, so dicts
+    # and environments always produce comparable digests
+    for k, v in sorted(items):
+        if k not in ignore:
+            checksum.update(_encode_checksum_field(k))
+            checksum.update(b"\x00")
+            checksum.update(_encode_checksum_field(v))
+            checksum.update(b"\x01")
+
+
 def _calc_checksum(o: typing.Any) -> str:
-    checksum = hashlib.md5()
+    checksum = hashlib.blake2b(digest_size=16)
 
     if isinstance(o, (tuple, list)):
-        for e in sorted(o):
-            checksum.update(str(e).encode('utf-8'))
+        # length-prefix each element so ["ab", "c"] != ["a", "bc"]
+        for e in sorted(_encode_checksum_field(e) for e in o):
+            checksum.update(struct.pack("<Q", len(e)))
+            checksum.update(e)
     elif isinstance(o, dict):
-        checksum.update(json.dumps(sorted(list(o.items()))).encode('utf-8'))
+        _update_checksum_items(checksum, o.items())
     else:
-        checksum.update(str(o).encode('utf-8'))
+        checksum.update(_encode_checksum_field(o))
 
     return checksum.hexdigest()
 
 
+def _calc_env_checksum(
+    environ: typing.Mapping[str, str],
+    ignore: typing.Container[str] = IGNORE_VARIABLES,
+) -> str:
+    # same as _calc_checksum() on the filtered dict, without building it
+    checksum = hashlib.blake2b(digest_size=16)
+    _update_checksum_items(checksum, environ.items(), ignore)
+    return checksum.hexdigest()
+
+
 def get_visual_studio_env_vars(
     vstudio: VisualStudio,
     vstudio_args: None | list[str] = None,
@@ -693,9 +1008,12 @@ def get_visual_studio_env_vars(
     env_cache = EnvironmentCache("visualstudio")
 
     args_hash = _calc_checksum([_clean_arg(e) for e in vstudio_args])
-    env_hash = _calc_checksum(
-        {k: v for k, v in os.environ.items() if k not in IGNORE_VARIABLES})
-    config = f"{vstudio.version}-{args_hash}-{env_hash}"
+    env_hash = _calc_env_checksum(os.environ)
+    # vsdevcmd.bat is touched by VS updates, which may change the environment
+    # without bumping the version we read from the ini
+    bat = vstudio.vsdevcmd_path
+    bat_mtime = os.stat(bat).st_mtime_ns if bat else 0
+    config = f"{vstudio.version}-{bat_mtime}-{args_hash}-{env_hash}"
 
     if not env and read_cache:
         env = env_cache.read_env(vstudio.uid, config)
@@ -703,7 +1021,11 @@ def get_visual_studio_env_vars(
     if not env:
         env = vstudio.dump_environment_vars(vstudio_args)
         if write_cache:
-            env_cache.write_env(vstudio.uid, config, env)
+            # the env was dumped fine, a cache we can't write isn't fatal
+            try:
+                env_cache.write_env(vstudio.uid, config, env)
+            except OSError:
+                pass
 
     return env
 
@@ -796,7 +1118,7 @@ def _add_vs_options(parser: argparse.ArgumentParser):
     parser.add_argument(
         "--app-platform",
         metavar="PLAT",
-        type=_argparse_caseins_choice_type(list(VisualStudioAppPlatform)),
+        type=_ArgparseCaseInsChoiceType(list(VisualStudioAppPlatform)),
         choices=list(VisualStudioAppPlatform),
         help="app platform target type (default: autodetect)",
     )
@@ -809,14 +1131,14 @@ def _add_vs_options(parser: argparse.ArgumentParser):
     parser.add_argument(
         "--host-arch",
         metavar="ARCH",
-        type=_argparse_caseins_choice_type(list(Arch)),
+        type=_ArgparseCaseInsChoiceType(list(Arch)),
         choices=list(Arch),
         help="host arch (default: autodetect)",
     )
     parser.add_argument(
         "--target-arch",
         metavar="ARCH",
-        type=_argparse_caseins_choice_type(list(Arch)),
+        type=_ArgparseCaseInsChoiceType(list(Arch)),
         choices=list(Arch),
         help="target arch (default: autodetect)",
     )
@@ -851,11 +1173,12 @@ def main(argv: list[str]) -> int:
     elif args.action in [Action.RUN, Action.DUMP]:
         if args.instance and re.match(r"^[a-zA-Z0-9]{8}$",
                                            args.instance):
-            vstudio = find_visual_studio_by_uid(args.instance)
+            vstudio = find_visual_studio_by_uid(
+                args.instance, args.read_cache, args.write_cache)
         elif args.instance:
             vstudio = find_visual_studio_by_path(args.instance)
         else:
-            vstudio = find_visual_studio()
+            vstudio = find_visual_studio(args.read_cache, args.write_cache)
         if not vstudio:
             raise ProgramNotFoundError("Failed to find Visual Studio.")
 